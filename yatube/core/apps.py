@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import pre_migrate
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        if getattr(settings, 'TESTING_NO_INDEXES', False):
+            from .signals import drop_indexes
+            pre_migrate.connect(drop_indexes, dispatch_uid='drop_indexes')
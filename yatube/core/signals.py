@@ -0,0 +1,11 @@
+from django.apps import apps
+
+
+def drop_indexes(sender, **kwargs):
+    """Убирает неуникальные индексы из моделей перед созданием схемы.
+    Используется только для тестовой БД: без индексов вставка строк
+    в фикстурах обходится дешевле."""
+    for model in apps.get_models():
+        for field in model._meta.local_fields:
+            field.db_index = False
+        model._meta.indexes = []
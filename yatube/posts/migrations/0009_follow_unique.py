@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-15 09:08
+
+from django.db import migrations, models
+
+
+def delete_duplicate_follows(apps, schema_editor):
+    # Из повторяющихся подписок оставляем самую раннюю
+    Follow = apps.get_model('posts', 'Follow')
+    keep_ids = (Follow.objects
+                .values('user', 'author')
+                .annotate(min_id=models.Min('id'))
+                .values('min_id'))
+    Follow.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_ordering'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
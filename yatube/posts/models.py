@@ -39,7 +39,15 @@ class Post(models.Model):
     )
 
     class Meta:
-        ordering = ['-pub_date']
+        # id разводит посты с одинаковой датой, чтобы страницы
+        # не теряли и не повторяли записи
+        ordering = ['-pub_date', '-id']
+        # Индексы повторяют сортировку лент: общей, группы и автора
+        indexes = [
+            models.Index(fields=['-pub_date', '-id']),
+            models.Index(fields=['group', '-pub_date', '-id']),
+            models.Index(fields=['author', '-pub_date', '-id']),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -79,3 +87,11 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+        ]
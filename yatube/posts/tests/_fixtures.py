@@ -0,0 +1,99 @@
+import atexit
+import functools
+import shutil
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def make_uploaded_gif():
+    """Новый файл на каждый вызов: указатель загруженного файла
+    сдвигается при чтении, поэтому переиспользовать его нельзя."""
+    return SimpleUploadedFile(
+        name='small.gif',
+        content=SMALL_GIF,
+        content_type='image/gif'
+    )
+
+
+def make_session_cookie(user):
+    """Авторизуемся один раз и возвращаем значение сессионной куки."""
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def make_authorized_client(session_cookie):
+    client = Client()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session_cookie
+    return client
+
+
+def with_clean_cache(test_func):
+    """Очищает кэш до и после теста, которому важно его состояние."""
+    @functools.wraps(test_func)
+    def wrapper(*args, **kwargs):
+        cache.clear()
+        try:
+            return test_func(*args, **kwargs)
+        finally:
+            cache.clear()
+    return wrapper
+
+
+class PostsTestCase(TestCase):
+    """Базовый класс тестов posts.
+
+    Кэш ContentType общий для процесса: первый класс заполняет его,
+    остальные получают типы без запросов, и число запросов в тестах
+    не зависит от порядка их запуска."""
+
+    @classmethod
+    def setUpTestData(cls):
+        ContentType.objects.get_for_models(*apps.get_models())
+
+
+class TempMediaMixin:
+    """Отдельный MEDIA_ROOT на тестовый класс: параллельные процессы
+    не делят каталог, и загруженные файлы удаляются вместе с ним."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_media_root = tempfile.mkdtemp(
+            prefix='yatube_test_', dir=settings.BASE_DIR)
+        # Если прогон прервут до tearDownClass (например, Ctrl+C),
+        # каталог удалится при выходе интерпретатора. При падении
+        # или kill процесса atexit не срабатывает.
+        atexit.register(shutil.rmtree, cls.temp_media_root, True)
+        cls.media_override = override_settings(
+            MEDIA_ROOT=cls.temp_media_root)
+        cls.media_override.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._remove_temp_media()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._remove_temp_media()
+
+    @classmethod
+    def _remove_temp_media(cls):
+        cls.media_override.disable()
+        shutil.rmtree(cls.temp_media_root, ignore_errors=True)
@@ -1,60 +1,49 @@
-import shutil
-import tempfile
+from http import HTTPStatus
+from unittest import mock
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import connection
+from django.test import Client, TransactionTestCase
 from django.urls import reverse
 
 from ..forms import PostForm
 from ..models import Comment, Post
+from ._fixtures import (PostsTestCase, TempMediaMixin,
+                        make_authorized_client, make_session_cookie,
+                        make_uploaded_gif)
 
 User = get_user_model()
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
-
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostCreateFormTests(TestCase):
+class PostCreateFormTests(TempMediaMixin, PostsTestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
-        cls.user = User.objects.create_user(username='auth')
         cls.form = PostForm()
 
     @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user(username='auth')
+        cls.session_cookie = make_session_cookie(cls.user)
+        # Пост, который гость пытается отредактировать и прокомментировать
+        cls.post = Post.objects.create(
+            text='Неотредактированный текст 2',
+            author=cls.user
+        )
 
     def setUp(self):
-        self.user = User.objects.get(username='auth')
-        self.authorized_client = Client()
-        self.authorized_client.force_login(self.user)
+        self.authorized_client = make_authorized_client(self.session_cookie)
         self.guest_client = Client()
 
     def test_create_post(self):
         """Валидная форма создает пост."""
         # Подсчитаем количество постов
         post_count = Post.objects.count()
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
-        uploaded = SimpleUploadedFile(
-            name='small.gif',
-            content=small_gif,
-            content_type='image/gif'
-        )
         form_data = {
             'text': 'Тестовый текст',
             'group': '',
-            'image': uploaded
+            'image': make_uploaded_gif()
         }
         # Отправляем POST-запрос
         response = self.authorized_client.post(
@@ -118,23 +107,18 @@ class PostCreateFormTests(TestCase):
         # Проверяем, не увеличилось ли число постов
         self.assertEqual(Post.objects.count(), post_count)
         # Проверяем, что текст отредактировался
-        self.assertEqual(Post.objects.get(pk=post_id).text,
-                         'Отредактированный текст')
+        post.refresh_from_db(fields=['text'])
+        self.assertEqual(post.text, 'Отредактированный текст')
 
     def test_guest_try_edit_post(self):
         """Проверяем, что гость не может редактировать пост."""
-        # Создадим пост, который будем редактировать
-        post = Post.objects.create(
-            text='Неотредактированный текст 2',
-            author=self.user
-        )
         # Подсчитаем количество постов
         post_count = Post.objects.count()
         form_data = {
             'text': 'Отредактированный текст 2',
             'group': '',
         }
-        post_id = post.pk
+        post_id = self.post.pk
         # Отправляем POST-запрос
         response = self.guest_client.post(
             reverse('posts:post_edit', kwargs={'post_id': post_id}),
@@ -147,8 +131,8 @@ class PostCreateFormTests(TestCase):
         # Проверяем, не увеличилось ли число постов
         self.assertEqual(Post.objects.count(), post_count)
         # Проверяем, что текст не отредактировался
-        self.assertEqual(Post.objects.get(pk=post_id).text,
-                         'Неотредактированный текст 2')
+        self.post.refresh_from_db(fields=['text'])
+        self.assertEqual(self.post.text, 'Неотредактированный текст 2')
 
     def test_create_comment(self):
         """Проверяем создание комментов."""
@@ -177,16 +161,12 @@ class PostCreateFormTests(TestCase):
         """Проверяем, что гость не может создать коммент."""
         # Подсчитаем количество постов
         comment_count = Comment.objects.count()
-        post = Post.objects.create(
-            text='Пост для коммента',
-            author=self.user
-        )
         form_data = {
             'text': 'Гостевой коммент'
         }
         # Отправляем POST-запрос
         self.guest_client.post(
-            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
             data=form_data,
             follow=True
         )
@@ -195,3 +175,31 @@ class PostCreateFormTests(TestCase):
         # Проверяем, что не существует коммент с заданным текстом
         self.assertFalse(Comment.objects.filter(
             text='Гостевой коммент').exists())
+
+    def test_comment_get_not_allowed(self):
+        """GET-запрос не создаёт коммент."""
+        response = self.authorized_client.get(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}))
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+
+class CommentMissingPostTests(TransactionTestCase):
+    """Внешний ключ проверяется только при фиксации транзакции,
+    поэтому TestCase, который её откатывает, этот случай не ловит."""
+
+    def setUp(self):
+        user = User.objects.create_user(username='auth')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(user)
+
+    def test_comment_missing_post(self):
+        """Коммент к несуществующему посту даёт 404."""
+        url = reverse('posts:add_comment', kwargs={'post_id': 404})
+        for atomic_requests in (False, True):
+            with self.subTest(atomic_requests=atomic_requests):
+                with mock.patch.dict(connection.settings_dict,
+                                     {'ATOMIC_REQUESTS': atomic_requests}):
+                    response = self.authorized_client.post(
+                        url, data={'text': 'Коммент'})
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertFalse(Comment.objects.exists())
@@ -1,10 +1,11 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 from django.test import Client, TestCase
 
 from ..models import Group, Post
+from ._fixtures import (PostsTestCase, make_authorized_client,
+                        make_session_cookie)
 
 User = get_user_model()
 
@@ -22,11 +23,12 @@ class StaticURLTests(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
 
-class PostURLTests(TestCase):
+class PostURLTests(PostsTestCase):
     @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
+    def setUpTestData(cls):
+        super().setUpTestData()
         cls.user = User.objects.create_user(username='auth')
+        cls.session_cookie = make_session_cookie(cls.user)
         cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='testslug',
@@ -38,31 +40,26 @@ class PostURLTests(TestCase):
         )
 
     def setUp(self):
-        cache.clear()
         self.guest_client = Client()
-        self.user = User.objects.get(username='auth')
-        self.authorized_client = Client()
-        self.authorized_client.force_login(self.user)
-
-    def test_urls_uses_correct_template(self):
-        """URL-адрес использует соответствующий шаблон."""
-        # Шаблоны по адресам
-        templates_url_names = {
-            'posts/index.html': '/',
-            'posts/group_list.html': f'/group/{self.group.slug}/',
-            'posts/profile.html': '/profile/auth/',
-            'posts/post_detail.html': f'/posts/{self.post.id}/',
-        }
-        for template, address in templates_url_names.items():
-            with self.subTest(address=address):
-                response = self.authorized_client.get(address)
-                self.assertTemplateUsed(response, template)
+        self.authorized_client = make_authorized_client(self.session_cookie)
 
     def test_404(self):
         """Страница 404 доступна любому пользователю."""
         response = self.guest_client.get('/unexistent-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
 
+    def test_missing_objects_404(self):
+        """Несуществующие автор и пост отдают 404, а не 500."""
+        addresses = [
+            '/profile/nobody/',
+            '/posts/0/',
+            '/posts/0/edit/',
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
     def test_create_url_uses_correct_template(self):
         """Страница по адресу /create/ использует шаблон
         posts/create_post.html."""
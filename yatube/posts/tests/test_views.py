@@ -1,19 +1,20 @@
-import shutil
-import tempfile
+from http import HTTPStatus
 
 from django import forms
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
 
-from ..models import Group, Post
+from ..models import Follow, Group, Post
+from ._fixtures import (PostsTestCase, TempMediaMixin,
+                        make_authorized_client, make_session_cookie,
+                        make_uploaded_gif, with_clean_cache)
 
 User = get_user_model()
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Сессия и пользователь, которые читает любой авторизованный запрос
+NUM_QUERIES_LOGGED_IN = 2
 
 
 def decompose_first_post(response):
@@ -25,25 +26,12 @@ def decompose_first_post(response):
     return post_author, post_group, post_text
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostsPagesTests(TestCase):
+class PostsPagesTests(TempMediaMixin, PostsTestCase):
     @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
+    def setUpTestData(cls):
+        super().setUpTestData()
         cls.user = User.objects.create_user(username='auth')
-        cls.small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
-        cls.uploaded = SimpleUploadedFile(
-            name='small.gif',
-            content=cls.small_gif,
-            content_type='image/gif'
-        )
+        cls.session_cookie = make_session_cookie(cls.user)
         cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='testslug',
@@ -53,73 +41,82 @@ class PostsPagesTests(TestCase):
             text='Текст',
             author=cls.user,
             group=cls.group,
-            image=cls.uploaded
+            image=make_uploaded_gif()
         )
-
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        cls.url_index = reverse('posts:index')
+        cls.url_group = reverse(
+            'posts:group_list', kwargs={'slug': cls.group.slug})
+        cls.url_profile = reverse(
+            'posts:profile', kwargs={'username': cls.user.username})
+        cls.url_post_detail = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id})
+        cls.url_post_edit = reverse(
+            'posts:post_edit', kwargs={'post_id': cls.post.id})
+        cls.url_post_create = reverse('posts:post_create')
+        cls.paginator_reverses = [
+            cls.url_index,
+            cls.url_group,
+            cls.url_profile,
+        ]
 
     def setUp(self):
-        cache.clear()
-        self.user = User.objects.get(username='auth')
-        self.authorized_client = Client()
-        self.authorized_client.force_login(self.user)
+        self.authorized_client = make_authorized_client(self.session_cookie)
 
     # Проверяем используемые шаблоны
+    @with_clean_cache
     def test_pages_uses_correct_template(self):
-        """URL-адрес использует соответствующий шаблон."""
-        # Собираем в словарь пары "страница: имя_html_шаблона"
+        """URL-адрес использует соответствующий шаблон
+        и делает ожидаемое число запросов к БД."""
+        # Миниатюра строится заранее с теми же параметрами, что в шаблоне,
+        # чтобы в подсчёт не попадали запросы sorl-thumbnail
+        get_thumbnail(self.post.image, '960x339', crop='center', upscale=True)
+        # Собираем в словарь пары
+        # "страница: (имя_html_шаблона, число_запросов)".
         templates_pages_names = {
-            reverse('posts:index'): 'posts/index.html',
-            (
-                reverse('posts:group_list', kwargs={'slug': self.group.slug})
-            ): 'posts/group_list.html',
-            (
-                reverse('posts:profile',
-                        kwargs={'username': self.user.username})
-            ): 'posts/profile.html',
-            (
-                reverse('posts:post_detail', kwargs={'post_id': self.post.id})
-            ): 'posts/post_detail.html',
-            (
-                reverse('posts:post_edit', kwargs={'post_id': self.post.id})
-            ): 'posts/create_post.html',
-            reverse('posts:post_create'): 'posts/create_post.html',
-            '/unexistent-page/': 'core/404.html',
+            self.url_index: (
+                'posts/index.html', NUM_QUERIES_LOGGED_IN + 3),
+            self.url_group: (
+                'posts/group_list.html', NUM_QUERIES_LOGGED_IN + 2),
+            self.url_profile: (
+                'posts/profile.html', NUM_QUERIES_LOGGED_IN + 2),
+            self.url_post_detail: (
+                'posts/post_detail.html', NUM_QUERIES_LOGGED_IN + 3),
+            self.url_post_edit: (
+                'posts/create_post.html', NUM_QUERIES_LOGGED_IN + 3),
+            self.url_post_create: (
+                'posts/create_post.html', NUM_QUERIES_LOGGED_IN + 1),
+            '/unexistent-page/': ('core/404.html', NUM_QUERIES_LOGGED_IN),
 
         }
         # Проверяем, что при обращении к name вызывается соответствующий
         # HTML-шаблон
-        for page_name, template in templates_pages_names.items():
+        for page_name, (template, num_queries) in (
+                templates_pages_names.items()):
             with self.subTest(page_name=page_name):
-                response = self.authorized_client.get(page_name)
+                with self.assertNumQueries(num_queries):
+                    response = self.authorized_client.get(page_name)
                 self.assertTemplateUsed(response, template)
 
+    @with_clean_cache
     def test_index_page_show_correct_context(self):
         """Шаблон index сформирован с правильным контекстом."""
-        response = self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(self.url_index)
         # Берём первый пост, разбираем его на элементы и сверяем с ожидаемым
         post_author, post_group, post_text = decompose_first_post(response)
         self.assertEqual(post_text, 'Текст')
-        self.assertEqual(post_author, User.objects.get(username='auth'))
-        self.assertEqual(post_group, Group.objects.get(slug='testslug'))
+        self.assertEqual(post_author, self.user)
+        self.assertEqual(post_group, self.group)
 
     def test_post_detail_pages_show_correct_context(self):
         """Шаблон post_detail сформирован с правильным контекстом."""
-        response = (self.authorized_client.
-                    get(reverse('posts:post_detail',
-                                kwargs={'post_id': self.post.id})))
+        response = self.authorized_client.get(self.url_post_detail)
         self.assertEqual(response.context.get('post').text, 'Текст')
-        self.assertEqual(response.context.get('post').author, User.objects.get(
-            username='auth'))
-        self.assertEqual(response.context.get('post').group, Group.objects.get(
-            slug='testslug'))
+        self.assertEqual(response.context.get('post').author, self.user)
+        self.assertEqual(response.context.get('post').group, self.group)
 
     def test_post_create_page_show_correct_context(self):
         """Шаблон post_create сформирован с правильным контекстом."""
-        response = self.authorized_client.get(reverse('posts:post_create'))
+        response = self.authorized_client.get(self.url_post_create)
         # Словарь ожидаемых типов полей формы:
         # указываем, объектами какого класса должны быть поля формы
         form_fields = {
@@ -140,8 +137,7 @@ class PostsPagesTests(TestCase):
 
     def test_post_edit_page_show_correct_context(self):
         """Шаблон post_edit сформирован с правильным контекстом."""
-        response = self.authorized_client.get(reverse(
-            'posts:post_edit', kwargs={'post_id': self.post.id}))
+        response = self.authorized_client.get(self.url_post_edit)
         # Словарь ожидаемых типов полей формы:
         # указываем, объектами какого класса должны быть поля формы
         form_fields = {
@@ -164,42 +160,39 @@ class PostsPagesTests(TestCase):
                 # указанного класса
                 self.assertIsInstance(form_field, expected)
 
+    @with_clean_cache
     def test_paginator(self):
         """Проверка: количество постов на первой странице равно 10,
         на второй 3."""
         posts = [Post(text=f'Текст {i}.', author=self.user,
                       group=self.group) for i in range(12)]
-        Post.objects.bulk_create(posts)
-        reverses = [
-            reverse('posts:index'),
-            (
-                reverse('posts:group_list', kwargs={'slug': 'testslug'})
-            ),
-            (
-                reverse('posts:profile', kwargs={'username': 'auth'})
-            ),
-        ]
-        # Ключ - номер страницы, значение - ожидаемое количество постов
-        pages = {'1': 10, '2': 3}
-        for page, result in pages.items():
-            for reverse_name in reverses:
-                with self.subTest(reverse_name=reverse_name):
-                    response = self.authorized_client.get(reverse_name,
-                                                          {'page': page})
-                    self.assertEqual(len(response.context['page_obj']), result)
+        Post.objects.bulk_create(posts, batch_size=12)
+        # Номер страницы и ожидаемое количество постов на ней.
+        # Для номера за пределами списка отдаётся последняя страница.
+        pages = ((1, 10), (2, 3), (3, 3))
+        for reverse_name in self.paginator_reverses:
+            for page, expected in pages:
+                with self.subTest(reverse_name=reverse_name, page=page):
+                    response = self.authorized_client.get(
+                        reverse_name, {'page': str(page)})
+                    self.assertEqual(len(response.context['page_obj']),
+                                     expected)
+
+    @with_clean_cache
+    def test_paginator_oversized_page(self):
+        """Для номера страницы больше 64-битного целого
+        отдаётся последняя страница."""
+        for reverse_name in self.paginator_reverses:
+            with self.subTest(reverse_name=reverse_name):
+                response = self.authorized_client.get(
+                    reverse_name, {'page': '9' * 20})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn(self.post, response.context['page_obj'])
 
+    @with_clean_cache
     def test_post_image_in_context(self):
         """При выводе поста с картинкой изображение передаётся в context."""
-        reverses = [
-            reverse('posts:index'),
-            (
-                reverse('posts:profile', kwargs={
-                    'username': self.user.username})),
-            (
-                reverse('posts:group_list', kwargs={'slug': self.group.slug})
-            ),
-        ]
-        for reverse_name in reverses:
+        for reverse_name in self.paginator_reverses:
             response = self.authorized_client.get(reverse_name)
             # Взяли первый элемент из списка и проверили, что его содержание
             # совпадает с ожидаемым
@@ -207,32 +200,35 @@ class PostsPagesTests(TestCase):
             post_image_0 = first_object.image
             self.assertEqual(post_image_0, self.post.image)
         # Отдельная проверка для страницы с постом.
-        response = self.authorized_client.get(reverse(
-            'posts:post_detail', kwargs={'post_id': self.post.id}))
+        response = self.authorized_client.get(self.url_post_detail)
         post_image_0 = response.context['post'].image
         self.assertEqual(post_image_0, self.post.image)
 
+    @with_clean_cache
     def test_cache_index(self):
         """Проверяем работу кэша."""
-        cache_post = Post.objects.create(
+        # Первый запрос кладёт в кэш id постов главной страницы
+        response = self.authorized_client.get(self.url_index)
+        self.assertContains(response, self.post.text)
+        Post.objects.create(
             text='Проверка кэша',
             author=self.user,
         )
-        response = self.authorized_client.get(reverse('posts:index'))
-        self.assertContains(response, 'Проверка кэша')
-        cache_post.delete()
-        response = self.authorized_client.get(reverse('posts:index'))
-        self.assertContains(response, 'Проверка кэша')
-        cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
+        # Пока кэш жив, новый пост на главной не появляется
+        response = self.authorized_client.get(self.url_index)
         self.assertNotContains(response, 'Проверка кэша')
+        # После очистки кэша главная показывает новый пост
+        cache.clear()
+        response = self.authorized_client.get(self.url_index)
+        self.assertContains(response, 'Проверка кэша')
 
 
-class PostsFilteredPagesTests(TestCase):
+class PostsFilteredPagesTests(PostsTestCase):
     @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
+    def setUpTestData(cls):
+        super().setUpTestData()
         cls.user = User.objects.create_user(username='auth')
+        cls.session_cookie = make_session_cookie(cls.user)
         cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='testslug',
@@ -256,21 +252,15 @@ class PostsFilteredPagesTests(TestCase):
             author=cls.wrong_user,
             group=cls.wrong_group
         )
+        cls.url_wrong_group = reverse(
+            'posts:group_list', kwargs={'slug': cls.wrong_group.slug})
+        cls.reverses = [
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+        ]
 
     def setUp(self):
-        self.user = User.objects.get(username='auth')
-        self.authorized_client = Client()
-        self.authorized_client.force_login(self.user)
-        self.reverses = [
-            (
-                reverse('posts:group_list',
-                        kwargs={'slug': self.group.slug})
-            ),
-            (
-                reverse('posts:profile',
-                        kwargs={'username': self.user.username})
-            ),
-        ]
+        self.authorized_client = make_authorized_client(self.session_cookie)
 
     def test_filtered_pages_show_correct_context(self):
         """Шаблоны с отфильтрованными постами сформированы
@@ -283,10 +273,8 @@ class PostsFilteredPagesTests(TestCase):
                 post_author, post_group, post_text = decompose_first_post(
                     response)
                 self.assertEqual(post_text, 'Текст')
-                self.assertEqual(post_author, User.objects.get(
-                    username='auth'))
-                self.assertEqual(post_group, Group.objects.get(
-                    slug='testslug'))
+                self.assertEqual(post_author, self.user)
+                self.assertEqual(post_group, self.group)
 
     def test_post_appears(self):
         """Дополнительная проверка при создании поста.
@@ -297,61 +285,72 @@ class PostsFilteredPagesTests(TestCase):
                 page = response.context['page_obj']
                 self.assertIn(self.post, page)
         # И убеждаемся что пост не появляется там, где не надо
-        response = self.authorized_client.get((
-            reverse('posts:group_list',
-                    kwargs={'slug': self.wrong_group.slug})))
+        response = self.authorized_client.get(self.url_wrong_group)
         page = response.context['page_obj']
         self.assertNotIn(self.post, page)
 
 
-class FollowTests(TestCase):
+class FollowTests(PostsTestCase):
     @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
+    def setUpTestData(cls):
+        super().setUpTestData()
         cls.user = User.objects.create_user(username='auth')
+        cls.session_cookie = make_session_cookie(cls.user)
         cls.followed_user = User.objects.create_user(username='followed')
         cls.not_following_user = User.objects.create_user(
             username='not_following')
+        cls.not_following_cookie = make_session_cookie(
+            cls.not_following_user)
         cls.post = Post.objects.create(
             text='Подписка',
             author=cls.followed_user
         )
+        username = cls.followed_user.username
+        cls.url_follow = reverse(
+            'posts:profile_follow', kwargs={'username': username})
+        cls.url_unfollow = reverse(
+            'posts:profile_unfollow', kwargs={'username': username})
+        cls.url_profile = reverse(
+            'posts:profile', kwargs={'username': username})
+        cls.url_follow_index = reverse('posts:follow_index')
 
     def setUp(self):
-        self.user = User.objects.get(username='auth')
-        self.authorized_client = Client()
-        self.authorized_client.force_login(self.user)
+        self.authorized_client = make_authorized_client(self.session_cookie)
 
     def test_follow(self):
         """Проверка подписки и отписки"""
         # Запрашиваем подписку
-        self.authorized_client.get(reverse('posts:profile_follow', kwargs={
-            'username': self.followed_user.username}))
-        response = self.authorized_client.get(reverse(
-            'posts:profile', kwargs={'username': self.followed_user.username}))
+        self.authorized_client.get(self.url_follow)
+        self.assertTrue(Follow.objects.filter(
+            user=self.user, author=self.followed_user).exists())
         # В контекст страницы профиля передаётся переменная following,
         # если юзер подписан на автора
+        response = self.authorized_client.get(self.url_profile)
         self.assertTrue(response.context['following'])
         # Запрашиваем отписку
-        self.authorized_client.get(reverse('posts:profile_unfollow', kwargs={
-            'username': self.followed_user.username}))
-        response = self.authorized_client.get(reverse(
-            'posts:profile', kwargs={'username': self.followed_user.username}))
-        self.assertFalse(response.context['following'])
+        self.authorized_client.get(self.url_unfollow)
+        self.assertFalse(Follow.objects.filter(
+            user=self.user, author=self.followed_user).exists())
+
+    def test_follow_twice(self):
+        """Повторная подписка не создаёт дубликат"""
+        self.authorized_client.get(self.url_follow)
+        self.authorized_client.get(self.url_follow)
+        self.assertEqual(Follow.objects.filter(
+            user=self.user, author=self.followed_user).count(), 1)
 
     def test_post_appearing(self):
         """Дополнительная проверка при создании поста.
         Убеждаемся, что пост появляется только в нужных местах."""
         # Запрашиваем подписку
-        self.authorized_client.get(reverse('posts:profile_follow', kwargs={
-            'username': self.followed_user.username}))
+        self.authorized_client.get(self.url_follow)
         # Убеждаемся что пост появляется там, где не надо
-        response = self.authorized_client.get(reverse('posts:follow_index'))
+        response = self.authorized_client.get(self.url_follow_index)
         page = response.context['page_obj']
         self.assertIn(self.post, page)
         # И убеждаемся что пост не появляется там, где не надо
-        not_following_client = Client()
-        not_following_client.force_login(self.not_following_user)
-        response = not_following_client.get(reverse('posts:follow_index'))
+        not_following_client = make_authorized_client(
+            self.not_following_cookie)
+        response = not_following_client.get(self.url_follow_index)
         page = response.context['page_obj']
         self.assertNotIn(self.post, page)
@@ -1,7 +1,54 @@
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 
+# OFFSET в SQL — знаковое 64-битное целое
+MAX_SQL_OFFSET = 2 ** 63 - 1
 
-def get_page_obj(post_list, posts_count, request):
-    paginator = Paginator(post_list, posts_count)
+
+class CountedPaginator(Paginator):
+    """Пагинатор, которому можно заранее передать число объектов,
+    чтобы не делать лишний SELECT COUNT(*)."""
+
+    def __init__(self, object_list, per_page, total=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.total = total
+
+    @cached_property
+    def count(self):
+        if self.total is None:
+            return super().count
+        return self.total
+
+
+def get_sliced_page(paginator, page_number):
+    """Выбирает на одну запись больше, чем помещается на страницу.
+    Если лишней записи нет, страница последняя и общее число постов
+    известно без SELECT COUNT(*). Для номера за пределами списка
+    или с недопустимым для БД смещением возвращает None."""
+    try:
+        number = int(page_number or 1)
+    except (TypeError, ValueError):
+        number = 1
+    if number < 1:
+        return None
+    bottom = (number - 1) * paginator.per_page
+    if bottom > MAX_SQL_OFFSET:
+        return None
+    top = bottom + paginator.per_page
+    object_list = list(paginator.object_list[bottom:top + 1])
+    if not object_list and number > 1:
+        return None
+    if len(object_list) <= paginator.per_page:
+        paginator.total = bottom + len(object_list)
+    return Page(object_list[:paginator.per_page], number, paginator)
+
+
+def get_page_obj(post_list, posts_count, request, total=None):
+    paginator = CountedPaginator(post_list, posts_count, total=total)
     page_number = request.GET.get('page')
+    if total is None and isinstance(post_list, QuerySet):
+        page_obj = get_sliced_page(paginator, page_number)
+        if page_obj is not None:
+            return page_obj
     return paginator.get_page(page_number)
@@ -1,19 +1,46 @@
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_POST
 
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
 from .utils import get_page_obj
 
 POSTS_COUNT = 10
+INDEX_CACHE_TIMEOUT = 20
+# Поля, которые выводит карточка поста в списках
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'group__slug', 'group__title'
+)
+AUTHOR_FIELDS = ('author__username', 'author__first_name', 'author__last_name')
+# Пустая форма комментария одна на процесс: шаблон её только читает
+_COMMENT_FORM = None
 
 
-@cache_page(timeout=20, key_prefix='index_page')
 def index(request):
-    """Рендер для главной страницы."""
-    post_list = Post.objects.all().order_by('-pub_date')
-    page_obj = get_page_obj(post_list, POSTS_COUNT, request)
+    """Рендер для главной страницы.
+    В кэше лежат только число постов и id постов страницы,
+    сами посты выбираются из БД на каждый запрос."""
+    total = cache.get_or_set(
+        'index_posts_count', Post.objects.count, INDEX_CACHE_TIMEOUT)
+    page_obj = get_page_obj(
+        Post.objects.values_list('id', flat=True),
+        POSTS_COUNT,
+        request,
+        total=total,
+    )
+    ids = cache.get_or_set(
+        f'index_ids_p{page_obj.number}',
+        lambda: list(page_obj.object_list),
+        INDEX_CACHE_TIMEOUT,
+    )
+    page_obj.object_list = (Post.objects
+                            .select_related('author', 'group')
+                            .only(*POST_FIELDS, *AUTHOR_FIELDS)
+                            .filter(id__in=ids))
     context = {
         'title': 'Последние обновления на сайте',
         'page_obj': page_obj,
@@ -24,7 +51,8 @@ def index(request):
 def group_posts(request, slug):
     """Рендер для страницы групп."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.select_related('author').only(
+        'id', 'text', 'pub_date', 'image', 'group', *AUTHOR_FIELDS)
     page_obj = get_page_obj(post_list, POSTS_COUNT, request)
     context = {
         'title': f'Записи сообщества {group}',
@@ -35,17 +63,20 @@ def group_posts(request, slug):
 
 
 def profile(request, username):
-    author = User.objects.get(username=username)
-    post_list = Post.objects.filter(author=author)
-    page_obj = get_page_obj(post_list, POSTS_COUNT, request)
-    following = False
+    authors = User.objects.all()
     if request.user.is_authenticated:
-        follow = Follow.objects.filter(user=request.user, author=author)
-        if follow:
-            following = True
+        # Подписку проверяем в том же запросе, что и автора
+        authors = authors.annotate(is_followed=Exists(
+            Follow.objects.filter(user=request.user, author=OuterRef('pk'))
+        ))
+    author = get_object_or_404(authors, username=username)
+    # author_id нужен менеджеру, чтобы подставить постам готового автора
+    post_list = author.posts.select_related('group').only(
+        *POST_FIELDS, 'author')
+    page_obj = get_page_obj(post_list, POSTS_COUNT, request)
+    following = getattr(author, 'is_followed', False)
     context = {
         'author': author,
-        'post_list': post_list,
         'page_obj': page_obj,
         'following': following
     }
@@ -53,9 +84,20 @@ def profile(request, username):
 
 
 def post_detail(request, post_id):
-    post = Post.objects.get(pk=post_id)
-    comment_list = Comment.objects.filter(post=post.id)
-    form = CommentForm()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group').prefetch_related(
+            Prefetch(
+                'comments',
+                queryset=Comment.objects.select_related('author')
+            )
+        ),
+        pk=post_id,
+    )
+    comment_list = post.comments.all()
+    global _COMMENT_FORM
+    if _COMMENT_FORM is None:
+        _COMMENT_FORM = CommentForm()
+    form = _COMMENT_FORM
     context = {
         'post': post,
         'comments': comment_list,
@@ -66,55 +108,62 @@ def post_detail(request, post_id):
 
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
-    if not request.method == 'POST' or not form.is_valid():
-        context = {'form': form}
-        return render(request, 'posts/create_post.html', context)
-    if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
-        username = request.user.get_username()
-        return redirect('posts:profile', username=username)
+    if request.method == 'POST':
+        form = PostForm(request.POST, files=request.FILES)
+        if form.is_valid():
+            post = form.save(commit=False)
+            post.author = request.user
+            post.save()
+            return redirect('posts:profile', username=request.user.username)
+    else:
+        form = PostForm()
+    context = {'form': form}
+    return render(request, 'posts/create_post.html', context)
 
 
 @login_required
 def post_edit(request, post_id):
-    post = Post.objects.get(pk=post_id)
-    form = PostForm(
-        request.POST or None,
-        files=request.FILES or None,
-        instance=post
-    )
+    post = get_object_or_404(Post, pk=post_id)
     if not post.author == request.user:
         return redirect('posts:post_detail', post_id=post_id)
-    if not request.method == 'POST' or not form.is_valid():
-        context = {
-            'form': form,
-            'post_id': post_id,
-            'is_edit': True
-        }
-        return render(request, 'posts/create_post.html', context)
-    if form.is_valid():
-        form.save()
-        return redirect('posts:post_detail', post_id=post_id)
+    if request.method == 'POST':
+        form = PostForm(request.POST, files=request.FILES, instance=post)
+        if form.is_valid():
+            form.save()
+            return redirect('posts:post_detail', post_id=post_id)
+    else:
+        form = PostForm(instance=post)
+    context = {
+        'form': form,
+        'post_id': post_id,
+        'is_edit': True
+    }
+    return render(request, 'posts/create_post.html', context)
 
 
 @login_required
+@require_POST
 def add_comment(request, post_id):
-    post = Post.objects.get(pk=post_id)
-    form = CommentForm(request.POST or None)
+    form = CommentForm(request.POST)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        # Пост не загружаем, только проверяем, что он есть: внешние ключи
+        # отложенные и при ATOMIC_REQUESTS сработали бы уже после ответа
+        if not Post.objects.filter(pk=post_id).exists():
+            raise Http404
+        Comment.objects.create(
+            author=request.user, post_id=post_id, **form.cleaned_data
+        )
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    following_ids = Follow.objects.filter(
+        user=request.user).values('author_id')
+    post_list = (Post.objects
+                 .filter(author_id__in=following_ids)
+                 .select_related('author', 'group')
+                 .only(*POST_FIELDS, *AUTHOR_FIELDS))
     page_obj = get_page_obj(post_list, POSTS_COUNT, request)
     context = {
         'title': 'Лента подписок',
@@ -126,19 +175,20 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     # Подписаться на автора
-    author = User.objects.get(username=username)
-    is_following = Follow.objects.filter(user=request.user, author=author)
-    if request.user != author and not is_following:
-        follow = Follow(user=request.user, author=author)
-        follow.save()
+    author_id = get_object_or_404(
+        User.objects.values_list('id', flat=True), username=username)
+    if author_id != request.user.id:
+        # Повторная подписка упирается в unique_follow и пропускается
+        Follow.objects.bulk_create(
+            [Follow(user=request.user, author_id=author_id)],
+            ignore_conflicts=True
+        )
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     # Дизлайк, отписка
-    follow = Follow.objects.filter(
-        user=request.user,
-        author=User.objects.get(username=username))
-    follow.delete()
+    Follow.objects.filter(
+        user=request.user, author__username=username).delete()
     return redirect('posts:profile', username=username)
@@ -2,17 +2,10 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from .forms import CreationForm
-
 User = get_user_model()
 
 
 class UserCreateFormTests(TestCase):
-    @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
-        cls.form = CreationForm()
-
     def setUp(self):
         self.guest_client = Client()
 
@@ -31,7 +24,7 @@ class UserCreateFormTests(TestCase):
             reverse('users:signup'),
             data=form_data
         )
-        # Убеждаемся, что у пользователя с отправленным юзернеймом
-        # та же самая почта
-        newuser = User.objects.get(username='test')
-        self.assertEqual(newuser.email, 'noreply@example.com')
+        # Убеждаемся, что создан пользователь с отправленными
+        # юзернеймом и почтой
+        self.assertTrue(User.objects.filter(
+            username='test', email='noreply@example.com').exists())
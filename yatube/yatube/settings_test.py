@@ -0,0 +1,45 @@
+import copy
+
+from .settings import *  # noqa: F401,F403
+from .settings import TEMPLATES
+
+DEBUG = False
+
+# Тестовая SQLite-база живёт в памяти: без синхронизации с диском
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+# Шаблоны компилируются один раз на процесс.
+# Явные loaders несовместимы с APP_DIRS.
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+
+class DisableMigrations:
+    """Схема создаётся прямо по моделям, а не по миграциям."""
+
+    def __contains__(self, item):
+        return True
+
+    def __getitem__(self, item):
+        return None
+
+
+# Без миграций схема строится по текущим моделям, поэтому
+# TESTING_NO_INDEXES успевает убрать из них индексы
+MIGRATION_MODULES = DisableMigrations()
+TESTING_NO_INDEXES = True